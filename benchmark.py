@@ -0,0 +1,89 @@
+"""
+Startup benchmark for the metadata remover
+Measures import time and first-file latency in a fresh interpreter, which is
+what every short-lived (e.g. serverless) invocation pays before doing any work.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from PIL import Image
+
+
+# Runs in a fresh interpreter so nothing is already imported or cached
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from metadata_remover import MetadataRemover
+imported = time.perf_counter()
+remover = MetadataRemover()
+success, message = remover.remove_metadata(sys.argv[1], sys.argv[2])
+finished = time.perf_counter()
+from PIL import Image
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_file_ms': (finished - imported) * 1000,
+    'plugins': len(Image.ID),
+    'success': success,
+}))
+"""
+
+SAMPLE_FORMATS = {
+    'sample.jpg': 'JPEG',
+    'sample.png': 'PNG',
+    'sample.tif': 'TIFF',
+    'sample.webp': 'WEBP',
+    'sample.bmp': 'BMP',
+}
+
+
+def create_samples(folder: str) -> list:
+    """Create one small test image per supported format."""
+    paths = []
+    for filename, image_format in SAMPLE_FORMATS.items():
+        path = os.path.join(folder, filename)
+        Image.new('RGB', (640, 480), (120, 80, 200)).save(path, format=image_format)
+        paths.append(path)
+    return paths
+
+
+def run_once(input_path: str, output_path: str) -> dict:
+    """Time import and first-file processing in a new Python process."""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, input_path, output_path],
+        cwd=project_dir, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    """Run the startup benchmark for every supported format."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("\n" + "="*60)
+    print(f"⏱️  Startup Benchmark (median of {runs} runs)")
+    print("="*60)
+    print(f"{'Input':<14}{'Import (ms)':>14}{'First file (ms)':>18}{'Plugins':>10}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for input_path in create_samples(folder):
+            output_path = os.path.join(folder, 'cleaned.jpg')
+            samples = [run_once(input_path, output_path) for _ in range(runs)]
+            if not all(sample['success'] for sample in samples):
+                print(f"{os.path.basename(input_path):<14}failed")
+                continue
+            import_ms = statistics.median(sample['import_ms'] for sample in samples)
+            first_ms = statistics.median(sample['first_file_ms'] for sample in samples)
+            print(f"{os.path.basename(input_path):<14}{import_ms:>14.1f}{first_ms:>18.1f}"
+                  f"{samples[-1]['plugins']:>10}")
+
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -54,14 +54,24 @@ def example_bulk_processing():
     results = remover.process_images(
         input_files,
         output_folder,
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        verify=True,  # Confirm each output really is metadata-free
+        report_path=os.path.join(output_folder, "report.jsonl"),  # One JSON record per file
+        keep_records=True  # Also keep the records in memory for the loop below
     )
     
     # Print summary
-    print("\n" + remover.get_summary())
+    print("\n" + remover.get_summary(results['report']))
     print(f"\nProcessed files: {len(results['processed'])}")
     print(f"Failed files: {len(results['failed'])}")
     print(f"Skipped files: {len(results['skipped'])}")
+    print(f"Verified files: {len(results['verified'])}")
+    
+    # Per-file records
+    for record in results['records']:
+        if record.status == 'processed':
+            print(f"{record.input}: {record.bytes_before} -> {record.bytes_after} bytes, "
+                  f"removed {record.metadata_removed}")
 
 
 def example_folder_processing():
@@ -152,6 +162,71 @@ def example_custom_output_naming():
         print(f"{'✅' if success else '❌'} {message}")
 
 
+def example_archive_processing():
+    """Example: Process images inside a ZIP or TAR archive"""
+    print("\n" + "="*60)
+    print("Example 6: Processing an Archive Without Extracting It")
+    print("="*60)
+    
+    remover = MetadataRemover()
+    
+    # Members are cleaned in parallel and written straight to the new archive
+    results = remover.process_archive(
+        "path/to/photos.zip",
+        "path/to/photos_cleaned.zip",
+        progress_callback=lambda c, t, m: print(f"[{c}] {m}"),
+        max_workers=4
+    )
+    
+    print("\n" + remover.get_summary())
+    print(f"\nCleaned members: {len(results['processed'])}")
+
+
+def example_sharded_processing():
+    """Example: Split one job across several machines"""
+    print("\n" + "="*60)
+    print("Example 7: Sharded Processing Over a Shared Folder")
+    print("="*60)
+    
+    remover = MetadataRemover()
+    
+    # Every machine lists the same inputs and uses the same shared output folder
+    input_folder = "/mnt/shared/archive"
+    output_folder = "/mnt/shared/cleaned"
+    input_files = sorted(os.path.join(input_folder, f) for f in os.listdir(input_folder))
+    
+    # Each machine claims shards that nobody else holds and returns once all are done
+    results = remover.process_shards(input_files, output_folder, shard_count=64)
+    print(f"This machine processed shards {results['shards']}")
+    
+    # Afterwards, on any one machine: combine the per-shard reports
+    summary = remover.merge_shard_reports(output_folder, 64, "/mnt/shared/report.csv")
+    print(f"Processed: {summary['processed']}, missing shards: {summary['missing_shards']}")
+
+
+def example_size_optimization():
+    """Example: Keep outputs small"""
+    print("\n" + "="*60)
+    print("Example 8: Optimizing Output Size")
+    print("="*60)
+    
+    remover = MetadataRemover()
+    
+    input_files = [
+        "path/to/image1.jpg",
+        "path/to/image2.png",
+    ]
+    
+    # Keep the smallest JPEG/WebP that stays visually lossless (PSNR >= 40 dB),
+    # or the losslessly stripped original if that is smaller
+    results = remover.process_images(input_files, "path/to/output/folder", min_psnr=40)
+    
+    for record in results['records']:
+        if record.status == 'processed':
+            print(f"{record.output} ({record.format}): {record.bytes_saved} bytes saved")
+    print(f"Total saved: {results['bytes_saved']} bytes")
+
+
 def main():
     """Main function to run all examples"""
     print("\n" + "="*60)
@@ -171,6 +246,9 @@ def main():
     print("  3. example_folder_processing() - Process all images in a folder")
     print("  4. example_check_supported_formats() - Check file format support")
     print("  5. example_custom_output_naming() - Custom output naming")
+    print("  6. example_archive_processing() - Clean images inside a ZIP/TAR archive")
+    print("  7. example_sharded_processing() - Split a job across several machines")
+    print("  8. example_size_optimization() - Keep outputs small")
     
     # Run the format checking example (doesn't need actual files)
     example_check_supported_formats()
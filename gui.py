@@ -386,7 +386,7 @@ class MetadataRemoverGUI:
     
     def _show_results(self, results, output_folder):
         """Show processing results."""
-        summary = self.remover.get_summary()
+        summary = self.remover.get_summary(results['report'])
         summary += f"\n📂 Output folder: {output_folder}"
         
         messagebox.showinfo("Processing Complete", summary)
@@ -5,10 +5,195 @@ A comprehensive tool to remove all metadata from images including EXIF, copyrigh
 
 import os
 import io
-from PIL import Image
-import piexif
+import posixpath
+import struct
+import threading
+import time
+from PIL import Image, UnidentifiedImageError
+# Register only the plugins behind SUPPORTED_FORMATS up front, so Image.open
+# never falls back to importing every plugin Pillow ships with
+from PIL import BmpImagePlugin, JpegImagePlugin, PngImagePlugin  # noqa: F401
+from PIL import TiffImagePlugin, WebPImagePlugin  # noqa: F401
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
+
+# Modules only needed for archives, reports and pixel hashing (csv, json,
+# hashlib, tarfile, zipfile, concurrent.futures) are imported where they are
+# used, so short-lived invocations don't pay for them at start-up.
+
+
+class FileResult:
+    """Outcome of cleaning a single file."""
+    
+    # Slots keep per-record overhead low when a batch holds millions of files.
+    # A plain class rather than a dataclass, since importing dataclasses alone
+    # noticeably slows start-up.
+    __slots__ = ('input', 'output', 'status', 'format', 'bytes_before', 'bytes_after',
+                 'metadata_removed', 'seconds', 'error', 'message', 'verified')
+    
+    def __init__(self, *, input: str, output: Optional[str], status: str,
+                 format: Optional[str], bytes_before: int, bytes_after: int,
+                 metadata_removed: Optional[List[str]], seconds: float,
+                 error: Optional[str], message: str, verified: Optional[bool]):
+        self.input = input
+        self.output = output
+        self.status = status  # 'processed', 'failed' or 'skipped'
+        self.format = format  # Output format, e.g. 'JPEG' or 'WEBP'
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+        self.metadata_removed = metadata_removed  # None when the input format cannot be scanned
+        self.seconds = seconds
+        self.error = error  # Exception class name for failures
+        self.message = message
+        self.verified = verified  # None when verification was not requested
+    
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes saved compared to the input (negative if the output grew)."""
+        return self.bytes_before - self.bytes_after
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"FileResult({fields})"
+    
+    def to_dict(self) -> dict:
+        """Return the record as a plain dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ResultWriter:
+    """Streams result records to a JSONL or CSV report as they are produced."""
+    
+    def __init__(self, report_path: str, append: bool = False):
+        self._file = open(report_path, 'a' if append else 'w', newline='', encoding='utf-8')
+        if self._file.tell() > 0:
+            # Terminate a line left unfinished by a writer that stopped mid-record
+            with open(report_path, 'rb') as existing:
+                existing.seek(-1, io.SEEK_END)
+                if existing.read(1) != b'\n':
+                    self._file.write('\n')
+        if report_path.lower().endswith('.csv'):
+            import csv
+            self._csv = csv.DictWriter(self._file, fieldnames=FileResult.__slots__)
+            if self._file.tell() == 0:
+                self._csv.writeheader()
+        else:
+            import json
+            self._csv = None
+            self._json = json.JSONEncoder(ensure_ascii=False)
+    
+    def write(self, record: FileResult) -> None:
+        """Append one record to the report."""
+        row = record.to_dict()
+        if self._csv is not None:
+            if row['metadata_removed'] is not None:
+                row['metadata_removed'] = ';'.join(row['metadata_removed'])
+            self._csv.writerow(row)
+        else:
+            self._file.write(self._json.encode(row) + '\n')
+    
+    def close(self) -> None:
+        """Flush and close the report file."""
+        self._file.close()
+
+
+class BatchReport:
+    """
+    Collects the results of one batch.
+    
+    Every batch gets its own report, so a single MetadataRemover can run
+    several batches concurrently. Records may be added from worker threads.
+    
+    With keep_records off only the counters and error messages stay in
+    memory, so very large batches that stream to a report file don't also
+    hold every record. It defaults to on unless a report_path is given.
+    """
+    
+    def __init__(self, report_path: Optional[str] = None,
+                 keep_records: Optional[bool] = None):
+        if keep_records is None:
+            keep_records = not report_path
+        self.keep_records = keep_records
+        self.records = []
+        self.processed_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+        self.verification_failed_count = 0
+        self.verification_seconds = 0.0
+        self.bytes_saved = 0
+        self.errors = []
+        self._lock = threading.Lock()
+        self._writer = None
+        if report_path:
+            self.stream_to(report_path)
+    
+    def stream_to(self, report_path: str, append: bool = False) -> None:
+        """Stream further records to a new report file, closing the current one."""
+        self.close()
+        with self._lock:
+            self._writer = ResultWriter(report_path, append)
+    
+    def add(self, record: FileResult, verification_seconds: float = 0.0) -> None:
+        """Record the outcome of one file."""
+        with self._lock:
+            if self.keep_records:
+                self.records.append(record)
+            if record.status == 'processed':
+                self.processed_count += 1
+                self.bytes_saved += record.bytes_saved
+            elif record.status == 'failed':
+                self.failed_count += 1
+                self.errors.append(record.message)
+            else:
+                self.skipped_count += 1
+            if record.verified is False:
+                self.verification_failed_count += 1
+                self.errors.append(record.message)
+            self.verification_seconds += verification_seconds
+            if self._writer is not None:
+                self._writer.write(record)
+    
+    def close(self) -> None:
+        """Close the streamed report, if any."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+    
+    def to_results(self) -> dict:
+        """
+        Build the results dictionary returned by the batch methods.
+        
+        The path lists and 'records' are empty unless records were kept; the
+        counts are always filled in.
+        """
+        results = {
+            'processed_count': self.processed_count,
+            'failed_count': self.failed_count,
+            'skipped_count': self.skipped_count,
+            'processed': [],
+            'failed': [],
+            'skipped': [],
+            'verified': [],
+            'verification_failed': [],
+            'verification_seconds': self.verification_seconds,
+            'bytes_saved': self.bytes_saved,
+            'records': self.records,
+            'report': self
+        }
+        for record in self.records:
+            if record.status == 'processed':
+                results['processed'].append(record.output)
+                if record.verified is not None:
+                    key = 'verified' if record.verified else 'verification_failed'
+                    results[key].append(record.output)
+            else:
+                results[record.status].append(record.input)
+        return results
+
+
+class _LeaseLost(Exception):
+    """Raised inside process_shards when another node took over a shard's lease."""
 
 
 class MetadataRemover:
@@ -16,15 +201,610 @@ class MetadataRemover:
     
     SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.webp', '.bmp'}
     
+    # Pillow decoder for each supported extension, passed to Image.open as a hint
+    PILLOW_FORMATS = {
+        '.jpg': 'JPEG',
+        '.jpeg': 'JPEG',
+        '.png': 'PNG',
+        '.tiff': 'TIFF',
+        '.tif': 'TIFF',
+        '.webp': 'WEBP',
+        '.bmp': 'BMP',
+    }
+    PILLOW_FORMAT_NAMES = ('JPEG', 'PNG', 'TIFF', 'WEBP', 'BMP')
+    
+    # File signatures used to pick a decoder for in-memory images
+    MAGIC_FORMATS = (
+        (b'\xff\xd8\xff', 'JPEG'),
+        (b'\x89PNG\r\n\x1a\n', 'PNG'),
+        (b'II*\x00', 'TIFF'),
+        (b'MM\x00*', 'TIFF'),
+        (b'BM', 'BMP'),
+    )
+    
+    # Output archive suffixes and the tarfile write mode used for each
+    TAR_WRITE_MODES = {
+        '.tar': 'w',
+        '.tar.gz': 'w:gz',
+        '.tgz': 'w:gz',
+        '.tar.bz2': 'w:bz2',
+        '.tar.xz': 'w:xz',
+    }
+    
+    # Quality range searched when optimizing output size
+    MIN_SEARCH_QUALITY = 30
+    MAX_SEARCH_QUALITY = 95
+    
+    # File extension for each output format
+    OUTPUT_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+    
+    # Subfolder of the output folder holding shard leases and reports
+    SHARD_FOLDER = '.shards'
+    
+    # Output formats whose pixels must decode identically to the input
+    LOSSLESS_OUTPUT_FORMATS = {'PNG', 'BMP', 'TIFF', 'WEBP_LOSSLESS'}
+    
+    # Header segments and chunks that only carry metadata
+    JPEG_APP_LABELS = {
+        (0xE1, b'Exif\x00'): 'EXIF',
+        (0xE1, b'http://ns.adobe.com/xap/'): 'XMP',
+        (0xE2, b'ICC_PROFILE\x00'): 'ICC',
+        (0xED, b'Photoshop 3.0\x00'): 'IPTC',
+    }
+    PNG_METADATA_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'iCCP', b'tIME'}
+    WEBP_METADATA_CHUNKS = {b'EXIF', b'XMP ', b'ICCP'}
+    
     def __init__(self):
-        self.processed_count = 0
-        self.failed_count = 0
-        self.errors = []
+        # Counters for standalone remove_metadata calls; only counts and errors are kept
+        self._standalone_report = BatchReport(keep_records=False)
+        # Report of the most recent batch or run of standalone calls, for get_summary()
+        self._report = self._standalone_report
+        self._report_lock = threading.Lock()
+    
+    @property
+    def processed_count(self) -> int:
+        """Number of images cleaned in the most recent batch."""
+        return self._report.processed_count
+    
+    @property
+    def failed_count(self) -> int:
+        """Number of images that failed in the most recent batch."""
+        return self._report.failed_count
+    
+    @property
+    def verification_failed_count(self) -> int:
+        """Number of outputs that failed verification in the most recent batch."""
+        return self._report.verification_failed_count
+    
+    @property
+    def errors(self) -> List[str]:
+        """Error messages from the most recent batch."""
+        return self._report.errors
     
     def is_supported_image(self, file_path: str) -> bool:
         """Check if the file is a supported image format."""
         return Path(file_path).suffix.lower() in self.SUPPORTED_FORMATS
     
+    def _sniff_format(self, source) -> Optional[str]:
+        """
+        Guess the Pillow format of an image without decoding it.
+        
+        Paths are judged by extension so no extra read is needed; file objects
+        by their leading bytes.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            return self.PILLOW_FORMATS.get(Path(source).suffix.lower())
+        
+        start = source.tell()
+        header = source.read(12)
+        source.seek(start)
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'WEBP'
+        for magic, image_format in self.MAGIC_FORMATS:
+            if header.startswith(magic):
+                return image_format
+        return None
+    
+    def _open_image(self, source, name: Optional[str] = None) -> Image.Image:
+        """
+        Open an image, trying the sniffed format before the other supported ones.
+        
+        Restricting Image.open to known formats skips probing every registered
+        plugin and never triggers Pillow's full plugin discovery. Only files
+        that none of them can read, such as a GIF named .jpg, fall back to
+        letting Pillow try every format it has.
+        
+        Args:
+            source: Path or binary file object of the image
+            name: Name to report in errors for file objects, such as an archive member
+        """
+        image_format = self._sniff_format(source)
+        if image_format is not None:
+            try:
+                return Image.open(source, formats=(image_format,))
+            except UnidentifiedImageError:
+                pass  # Mislabelled file, try the remaining formats
+        try:
+            return Image.open(source, formats=self.PILLOW_FORMAT_NAMES)
+        except UnidentifiedImageError:
+            pass
+        try:
+            return Image.open(source)
+        except UnidentifiedImageError:
+            if isinstance(source, (str, os.PathLike)) or name is None:
+                raise
+            # Pillow's message would show the buffer's repr instead of a name
+            raise UnidentifiedImageError(f"cannot identify image file {name!r}") from None
+    
+    def _flatten_to_rgb(self, img: Image.Image) -> Image.Image:
+        """Convert an image to RGB, compositing any transparency onto white."""
+        # Convert to RGB if necessary (for PNG with transparency, etc.)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Create a white background
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            if img.mode in ('RGBA', 'LA'):
+                background.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
+                img = background
+            else:
+                img = img.convert('RGB')
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        return img
+    
+    def _clean_image(self, source, destination, name: Optional[str] = None) -> None:
+        """
+        Re-encode an image without any metadata.
+        
+        Args:
+            source: Path or binary file object of the input image
+            destination: Path or binary file object for the cleaned JPEG
+            name: Name of the input to report in errors
+        """
+        # Open the image
+        with self._open_image(source, name) as img:
+            img = self._flatten_to_rgb(img)
+            
+            # Pillow copies some info entries (e.g. JPEG comments) into the output
+            img.info = {}
+            
+            # Create a new image without any metadata
+            # We'll save it to a bytes buffer first to ensure all metadata is stripped
+            img_bytes = io.BytesIO()
+            
+            # Save without any EXIF or metadata
+            img.save(img_bytes, format='JPEG', quality=95, optimize=True)
+            
+            # Reload the image from bytes to ensure it's completely clean
+            img_bytes.seek(0)
+            clean_img = Image.open(img_bytes, formats=('JPEG',))
+            
+            # Save the final clean image
+            clean_img.save(destination, format='JPEG', quality=95, optimize=True)
+    
+    def _encode(self, img: Image.Image, image_format: str, quality: int) -> bytes:
+        """Encode an image as JPEG or WebP at the given quality."""
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        else:
+            img.save(buffer, format='WEBP', quality=quality, method=4)
+        return buffer.getvalue()
+    
+    def _psnr(self, reference: Image.Image, data: bytes) -> float:
+        """Peak signal-to-noise ratio of an encoded image against the original, in dB."""
+        import math
+        from PIL import ImageChops, ImageStat
+        
+        with Image.open(io.BytesIO(data), formats=('JPEG', 'WEBP')) as decoded:
+            diff = ImageChops.difference(reference, decoded.convert(reference.mode))
+        mse = sum(rms ** 2 for rms in ImageStat.Stat(diff).rms) / len(diff.getbands())
+        if mse == 0:
+            return float('inf')
+        return 10 * math.log10(255 ** 2 / mse)
+    
+    def _search_quality(self, img: Image.Image, image_format: str, max_bytes: Optional[int],
+                        min_psnr: Optional[float]) -> Tuple[Optional[bytes], bytes]:
+        """
+        Binary-search the encoder quality for the best acceptable encoding.
+        
+        With min_psnr this is the lowest quality that still meets the threshold
+        (the smallest file); otherwise the highest quality that fits max_bytes.
+        
+        Returns:
+            Tuple of (best encoding or None if no quality meets the targets,
+            smallest encoding tried)
+        """
+        low, high = self.MIN_SEARCH_QUALITY, self.MAX_SEARCH_QUALITY
+        best = None
+        smallest = None
+        while low <= high:
+            quality = (low + high) // 2
+            data = self._encode(img, image_format, quality)
+            if smallest is None or len(data) < len(smallest):
+                smallest = data
+            if min_psnr is not None:
+                if self._psnr(img, data) >= min_psnr:
+                    best, high = data, quality - 1
+                else:
+                    low = quality + 1
+            else:
+                if len(data) <= max_bytes:
+                    best, low = data, quality + 1
+                else:
+                    high = quality - 1
+        if best is not None and max_bytes is not None and len(best) > max_bytes:
+            best = None
+        return best, smallest
+    
+    def _clean_optimized(self, source, destination, max_bytes: Optional[int],
+                         min_psnr: Optional[float],
+                         name: Optional[str] = None) -> Tuple[str, bool, bool]:
+        """
+        Write the smallest metadata-free encoding that meets a size or quality target.
+        
+        JPEG and WebP (when Pillow supports it) are searched in parallel. A
+        lossless strip of the input is used instead when it is smaller still.
+        If no encoding meets the target, the smallest encoding tried is used
+        for a byte target and the regular JPEG output for a quality target.
+        
+        Args:
+            source: Path or BytesIO of the input image
+            destination: Path or BytesIO for the cleaned image
+            max_bytes: Largest acceptable output size
+            min_psnr: Lowest acceptable quality, as PSNR against the input in dB
+            name: Name of the input to report in errors
+            
+        Returns:
+            Tuple of (output format: str, target met: bool, output is a lossless strip: bool)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from PIL import features
+        
+        if isinstance(source, io.BytesIO):
+            data = source.getvalue()
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        
+        image_formats = ['JPEG']
+        if features.check('webp'):
+            image_formats.append('WEBP')
+        
+        with self._open_image(io.BytesIO(data), name) as img:
+            img = self._flatten_to_rgb(img)
+            img.info = {}
+            # Each encoder gets its own copy since Image.save is not thread-safe
+            with ThreadPoolExecutor(max_workers=len(image_formats)) as executor:
+                futures = [
+                    executor.submit(self._search_quality, img.copy(), image_format,
+                                    max_bytes, min_psnr)
+                    for image_format in image_formats
+                ]
+                searches = [(image_format, future.result())
+                            for image_format, future in zip(image_formats, futures)]
+        candidates = [(image_format, best) for image_format, (best, _) in searches
+                      if best is not None]
+        
+        target_met = bool(candidates)
+        if not target_met and min_psnr is None:
+            # Get as close to the byte budget as possible
+            candidates = [(image_format, smallest) for image_format, (_, smallest) in searches]
+        elif not target_met:
+            fallback = io.BytesIO()
+            self._clean_image(io.BytesIO(data), fallback, name)
+            candidates.append(('JPEG', fallback.getvalue()))
+        
+        # Fall back to a lossless strip of the input whenever it is smaller
+        stripped = self._strip_losslessly(data)
+        if stripped is not None:
+            candidates.append(stripped)
+        
+        image_format, output = min(candidates, key=lambda candidate: len(candidate[1]))
+        lossless = stripped is not None and output is stripped[1]
+        if lossless:
+            # A lossless strip has perfect quality, so only the byte budget can rule it out
+            target_met = max_bytes is None or len(output) <= max_bytes
+        if isinstance(destination, io.BytesIO):
+            destination.write(output)
+        else:
+            with open(destination, 'wb') as f:
+                f.write(output)
+        return image_format, target_met, lossless
+    
+    def _scan_jpeg(self, f) -> List[str]:
+        """Collect metadata segments from a JPEG header, stopping at the first scan."""
+        found = []
+        while True:
+            byte = f.read(1)
+            if not byte:
+                break
+            if byte != b'\xff':
+                raise ValueError("Corrupt JPEG marker stream")
+            marker = f.read(1)
+            while marker == b'\xff':  # Skip fill bytes
+                marker = f.read(1)
+            if not marker:
+                break
+            code = marker[0]
+            if code in (0xDA, 0xD9):  # Start of scan / end of image
+                break
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Markers without a length
+                continue
+            length = struct.unpack('>H', f.read(2))[0] - 2
+            ident = f.read(min(length, 32))
+            f.seek(length - len(ident), io.SEEK_CUR)
+            label = self._jpeg_metadata_label(code, ident)
+            if label is not None:
+                found.append(label)
+        return found
+    
+    def _jpeg_metadata_label(self, code: int, ident: bytes) -> Optional[str]:
+        """Name the metadata a JPEG segment carries, or None if it is needed for decoding."""
+        if code == 0xFE:
+            return 'COM'
+        if not 0xE0 <= code <= 0xEF:
+            return None
+        if code == 0xE0 and ident.startswith(b'JFIF\x00'):
+            return None  # The JFIF header only holds density information
+        if code == 0xEE and ident.startswith(b'Adobe'):
+            return None  # Tells the decoder which colour transform was used
+        for (app, prefix), name in self.JPEG_APP_LABELS.items():
+            if code == app and ident.startswith(prefix):
+                return name
+        return f"APP{code - 0xE0}"
+    
+    def _strip_jpeg(self, data: bytes) -> bytes:
+        """Copy a JPEG without its metadata segments or trailing data, keeping the scans as-is."""
+        out = bytearray(data[:2])
+        pos = 2
+        while True:
+            if data[pos] != 0xFF:
+                raise ValueError("Corrupt JPEG marker stream")
+            while data[pos + 1] == 0xFF:  # Skip fill bytes
+                pos += 1
+            code = data[pos + 1]
+            if code == 0xD9:  # End of image; anything after it is dropped
+                out += b'\xff\xd9'
+                return bytes(out)
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Markers without a length
+                out += data[pos:pos + 2]
+                pos += 2
+                continue
+            end = pos + 2 + struct.unpack_from('>H', data, pos + 2)[0]
+            if self._jpeg_metadata_label(code, data[pos + 4:min(end, pos + 36)]) is None:
+                out += data[pos:end]
+            pos = end
+            if code == 0xDA:
+                # Copy the entropy-coded data up to the next real marker
+                scan_end = pos
+                while True:
+                    scan_end = data.index(b'\xff', scan_end)
+                    following = data[scan_end + 1]
+                    if following != 0x00 and not 0xD0 <= following <= 0xD7:
+                        break
+                    scan_end += 2
+                out += data[pos:scan_end]
+                pos = scan_end
+    
+    def _strip_png(self, data: bytes) -> bytes:
+        """Copy a PNG without its metadata chunks, keeping the image data as-is."""
+        out = bytearray(data[:8])
+        pos = 8
+        while True:
+            length, chunk_type = struct.unpack_from('>I4s', data, pos)
+            end = pos + length + 12  # Length, type, data and CRC
+            if end > len(data):
+                raise ValueError("Truncated PNG chunk")
+            if chunk_type not in self.PNG_METADATA_CHUNKS:
+                out += data[pos:end]
+            pos = end
+            if chunk_type == b'IEND':
+                return bytes(out)
+    
+    def _strip_losslessly(self, data: bytes) -> Optional[Tuple[str, bytes]]:
+        """
+        Remove metadata from a JPEG or PNG without re-encoding it.
+        
+        Returns:
+            Tuple of (format, stripped bytes), or None for other or corrupt inputs
+        """
+        try:
+            if data[:2] == b'\xff\xd8':
+                return 'JPEG', self._strip_jpeg(data)
+            if data[:8] == b'\x89PNG\r\n\x1a\n':
+                return 'PNG', self._strip_png(data)
+        except (ValueError, IndexError, struct.error):
+            pass
+        return None
+    
+    def _scan_png(self, f) -> List[str]:
+        """Collect metadata chunks from a PNG, reading only the chunk headers."""
+        found = []
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type == b'IEND':
+                break
+            if chunk_type in self.PNG_METADATA_CHUNKS:
+                found.append(chunk_type.decode('ascii'))
+            f.seek(length + 4, io.SEEK_CUR)  # Chunk data plus CRC
+        return found
+    
+    def _scan_webp(self, f) -> Tuple[str, List[str]]:
+        """Collect metadata chunks from a WebP file and report whether it is lossless."""
+        found = []
+        image_format = 'WEBP'
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_type, length = struct.unpack('<4sI', header)
+            if chunk_type == b'VP8L':
+                image_format = 'WEBP_LOSSLESS'
+            elif chunk_type in self.WEBP_METADATA_CHUNKS:
+                found.append(chunk_type.decode('ascii').strip())
+            f.seek(length + (length & 1), io.SEEK_CUR)  # Chunks are padded to even sizes
+        return image_format, found
+    
+    def find_metadata(self, source) -> Tuple[str, List[str]]:
+        """
+        Scan the header and metadata region of an image for embedded metadata.
+        
+        Only segment and chunk headers are read, so this costs a small fraction
+        of decoding the image. JPEGs are scanned up to the first scan, which is
+        where Pillow and virtually every encoder place their metadata.
+        
+        Args:
+            source: Path or seekable binary file object of the image
+            
+        Returns:
+            Tuple of (format: str, metadata: list of segment/chunk names found)
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.find_metadata(f)
+        
+        start = source.tell()
+        try:
+            signature = source.read(12)
+            if signature[:2] == b'\xff\xd8':
+                source.seek(start + 2)
+                return 'JPEG', self._scan_jpeg(source)
+            if signature[:8] == b'\x89PNG\r\n\x1a\n':
+                source.seek(start + 8)
+                return 'PNG', self._scan_png(source)
+            if signature[:4] == b'RIFF' and signature[8:12] == b'WEBP':
+                return self._scan_webp(source)
+            raise ValueError("Cannot verify this output format")
+        finally:
+            source.seek(start)
+    
+    def _pixel_digest(self, img: Image.Image) -> str:
+        """Hash the decoded pixels of an image."""
+        import hashlib
+        digest = hashlib.sha256(f"{img.mode}:{img.size}".encode('ascii'))
+        digest.update(img.tobytes())
+        return digest.hexdigest()
+    
+    def _verify_output(self, input_source, output_source, verify_pixels: bool = False,
+                       lossless: bool = False) -> Optional[str]:
+        """
+        Check that a cleaned output carries no metadata.
+        
+        Args:
+            input_source: Path or binary file object of the original image
+            output_source: Path or binary file object of the cleaned image
+            verify_pixels: Also compare pixel hashes when the output is lossless
+            lossless: The output is a lossless strip of the input, so its pixels
+                must match even when its format is lossy (JPEG)
+            
+        Returns:
+            A description of the problem, or None if the output is clean
+        """
+        image_format, found = self.find_metadata(output_source)
+        if found:
+            return f"metadata still present ({', '.join(found)})"
+        
+        if verify_pixels and (lossless or image_format in self.LOSSLESS_OUTPUT_FORMATS):
+            with self._open_image(output_source) as output_img:
+                output_img.load()
+                output_digest = self._pixel_digest(output_img)
+                with self._open_image(input_source) as input_img:
+                    if output_img.mode == 'RGB':
+                        input_img = self._flatten_to_rgb(input_img)
+                    elif input_img.mode != output_img.mode:
+                        input_img = input_img.convert(output_img.mode)
+                    if self._pixel_digest(input_img) != output_digest:
+                        return "pixels differ from the input"
+        return None
+    
+    def _size(self, target) -> int:
+        """Return the size in bytes of a path or in-memory buffer."""
+        if isinstance(target, io.BytesIO):
+            return target.getbuffer().nbytes
+        return os.path.getsize(target)
+    
+    def _scan_input_metadata(self, source) -> Optional[List[str]]:
+        """List the metadata in an input image, or None if its format can't be scanned."""
+        try:
+            return self.find_metadata(source)[1]
+        except (ValueError, struct.error):
+            return None
+    
+    def _clean_file(self, source, destination, input_name: str, output_name: Optional[str],
+                    verify: bool = False, verify_pixels: bool = False,
+                    max_bytes: Optional[int] = None,
+                    min_psnr: Optional[float] = None) -> Tuple[FileResult, float]:
+        """
+        Clean one image and describe the outcome.
+        
+        Args:
+            source: Path or BytesIO of the input image
+            destination: Path or BytesIO for the cleaned image
+            input_name: Name of the input used in the record
+            output_name: Name of the output used in the record
+            verify: Re-scan the output to confirm no metadata remains
+            verify_pixels: With verify, also compare pixel hashes for lossless outputs
+            max_bytes: Optimize the output to fit this many bytes (see _clean_optimized)
+            min_psnr: Optimize the output down to this quality (see _clean_optimized)
+            
+        Returns:
+            Tuple of (record: FileResult, verification time in seconds)
+        """
+        started = time.perf_counter()
+        try:
+            bytes_before = self._size(source)
+            metadata = self._scan_input_metadata(source)
+            if max_bytes is None and min_psnr is None:
+                self._clean_image(source, destination, input_name)
+                image_format, target_met, lossless = 'JPEG', True, False
+            else:
+                image_format, target_met, lossless = self._clean_optimized(
+                    source, destination, max_bytes, min_psnr, input_name
+                )
+            bytes_after = self._size(destination)
+        except Exception as e:
+            record = FileResult(
+                input=input_name, output=None, status='failed', format=None,
+                bytes_before=0, bytes_after=0, metadata_removed=None,
+                seconds=time.perf_counter() - started, error=type(e).__name__,
+                message=f"Failed to process {os.path.basename(input_name)}: {str(e)}",
+                verified=None
+            )
+            return record, 0.0
+        
+        message = f"Successfully cleaned: {os.path.basename(input_name)}"
+        if max_bytes is not None or min_psnr is not None:
+            message += f" ({image_format}, {bytes_before - bytes_after} bytes saved"
+            message += ")" if target_met else ", target not reached)"
+        record = FileResult(
+            input=input_name, output=output_name, status='processed', format=image_format,
+            bytes_before=bytes_before, bytes_after=bytes_after, metadata_removed=metadata,
+            seconds=time.perf_counter() - started, error=None, message=message,
+            verified=None
+        )
+        
+        verification_seconds = 0.0
+        if verify:
+            verify_started = time.perf_counter()
+            for target in (source, destination):
+                if isinstance(target, io.BytesIO):
+                    target.seek(0)
+            try:
+                problem = self._verify_output(source, destination, verify_pixels, lossless)
+            except Exception as e:
+                # An output that can't be checked doesn't count as clean
+                problem = f"could not be checked ({type(e).__name__}: {e})"
+            verification_seconds = time.perf_counter() - verify_started
+            record.verified = problem is None
+            if problem is not None:
+                record.message = f"Verification failed for {os.path.basename(input_name)}: {problem}"
+        return record, verification_seconds
+    
     def remove_metadata(self, input_path: str, output_path: str) -> Tuple[bool, str]:
         """
         Remove all metadata from an image.
@@ -36,48 +816,98 @@ class MetadataRemover:
         Returns:
             Tuple of (success: bool, message: str)
         """
-        try:
-            # Open the image
-            with Image.open(input_path) as img:
-                # Convert to RGB if necessary (for PNG with transparency, etc.)
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    # Create a white background
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    if img.mode in ('RGBA', 'LA'):
-                        background.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
-                        img = background
-                    else:
-                        img = img.convert('RGB')
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Create a new image without any metadata
-                # We'll save it to a bytes buffer first to ensure all metadata is stripped
-                img_bytes = io.BytesIO()
-                
-                # Save without any EXIF or metadata
-                img.save(img_bytes, format='JPEG', quality=95, optimize=True)
-                
-                # Reload the image from bytes to ensure it's completely clean
-                img_bytes.seek(0)
-                clean_img = Image.open(img_bytes)
-                
-                # Save the final clean image
-                clean_img.save(output_path, format='JPEG', quality=95, optimize=True)
-            
-            self.processed_count += 1
-            return True, f"Successfully cleaned: {os.path.basename(input_path)}"
-            
-        except Exception as e:
-            self.failed_count += 1
-            error_msg = f"Failed to process {os.path.basename(input_path)}: {str(e)}"
-            self.errors.append(error_msg)
-            return False, error_msg
+        record, _ = self._clean_file(input_path, output_path, input_path, output_path)
+        with self._report_lock:
+            # Never add to a batch's report; start fresh counters after a batch ran
+            if self._report is not self._standalone_report:
+                self._standalone_report = BatchReport(keep_records=False)
+                self._report = self._standalone_report
+            report = self._standalone_report
+        report.add(record)
+        return record.status == 'processed', record.message
+    
+    def _reserve_output(self, output_folder: str, base_name: str,
+                        extension: str = '.jpg') -> str:
+        """
+        Claim a unique output filename by creating it exclusively.
+        
+        Exclusive creation keeps names collision-free even when several
+        batches write into the same folder at the same time.
+        """
+        counter = 0
+        while True:
+            suffix = f"_{counter}" if counter else ""
+            output_file = os.path.join(output_folder, f"{base_name}_cleaned{suffix}{extension}")
+            try:
+                fd = os.open(output_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                counter += 1
+                continue
+            os.close(fd)
+            return output_file
+    
+    def _publish_output(self, partial_file: str, output_folder: str, base_name: str,
+                        extension: str = '.jpg') -> str:
+        """
+        Move a finished output from its partial file to a unique final name.
+        
+        Hard links fail instead of overwriting a taken name, so an output only
+        ever appears under its final name complete. Filesystems without hard
+        links fall back to reserving the name and replacing it.
+        """
+        counter = 0
+        while True:
+            suffix = f"_{counter}" if counter else ""
+            output_file = os.path.join(output_folder, f"{base_name}_cleaned{suffix}{extension}")
+            try:
+                os.link(partial_file, output_file)
+            except FileExistsError:
+                counter += 1
+                continue
+            except OSError:
+                if not os.path.exists(partial_file):
+                    raise
+                output_file = self._reserve_output(output_folder, base_name, extension)
+                os.replace(partial_file, output_file)
+                return output_file
+            os.remove(partial_file)
+            return output_file
+    
+    def _clear_leftovers(self, output_folder: str, partial_prefix: str,
+                         input_files: List[str], min_age: float) -> None:
+        """
+        Remove what a stopped node left behind while cleaning some of input_files.
+        
+        That is its .partial files, and empty reserved outputs for those inputs.
+        Only files untouched for min_age seconds are removed, so a running node's
+        files are left alone.
+        """
+        import re
+        stems = {Path(input_file).stem for input_file in input_files}
+        reserved = re.compile(r'(.*)_cleaned(?:_\d+)?\.(?:jpg|webp|png)')
+        cutoff = time.time() - min_age
+        with os.scandir(output_folder) as entries:
+            for entry in entries:
+                partial = (entry.name.startswith(f".{partial_prefix}")
+                           and entry.name.endswith('.partial'))
+                if not partial:
+                    match = reserved.fullmatch(entry.name)
+                    if match is None or match.group(1) not in stems:
+                        continue
+                try:
+                    stat = entry.stat()
+                    if entry.is_file() and stat.st_mtime <= cutoff and (
+                            partial or stat.st_size == 0):
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
     
     def process_images(self, input_files: List[str], output_folder: str, 
-                      progress_callback=None) -> dict:
+                      progress_callback=None, verify: bool = False,
+                      verify_pixels: bool = False, report_path: Optional[str] = None,
+                      shard_count: int = 1, shard_index: int = 0,
+                      max_bytes: Optional[int] = None, min_psnr: Optional[float] = None,
+                      keep_records: Optional[bool] = None) -> dict:
         """
         Process multiple images and remove their metadata.
         
@@ -85,69 +915,629 @@ class MetadataRemover:
             input_files: List of input file paths
             output_folder: Folder where cleaned images will be saved
             progress_callback: Optional callback function for progress updates
+            verify: Re-scan each output's header to confirm no metadata remains
+            verify_pixels: With verify, also compare pixel hashes for lossless outputs
+            report_path: Optional .jsonl or .csv file that each result record is streamed to
+            shard_count: Split the inputs into this many shards (see shard_of)
+            shard_index: Only process inputs that fall into this shard
+            max_bytes: Optimize each output to fit this many bytes
+            min_psnr: Optimize each output down to this quality (PSNR in dB); the
+                smallest JPEG, WebP or losslessly stripped result is kept
+            keep_records: Keep every FileResult in memory; defaults to True
+                unless report_path is set (see BatchReport)
             
         Returns:
-            Dictionary with processing results
+            Dictionary with processing results; 'records' holds a FileResult per
+            input, 'report' the BatchReport for get_summary() and 'bytes_saved'
+            the total size reduction
         """
-        self.processed_count = 0
-        self.failed_count = 0
-        self.errors = []
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"shard_index must be between 0 and {shard_count - 1}")
+        if shard_count > 1:
+            input_files = [f for f in input_files if self.shard_of(f, shard_count) == shard_index]
         
         # Create output folder if it doesn't exist
         os.makedirs(output_folder, exist_ok=True)
         
+        report = BatchReport(report_path, keep_records)
+        try:
+            self._process_files(input_files, output_folder, report, progress_callback,
+                                verify, verify_pixels, max_bytes, min_psnr)
+        finally:
+            report.close()
+        
+        self._report = report
+        return report.to_results()
+    
+    def _process_files(self, input_files: List[str], output_folder: str, report: BatchReport,
+                       progress_callback=None, verify: bool = False,
+                       verify_pixels: bool = False, max_bytes: Optional[int] = None,
+                       min_psnr: Optional[float] = None, partial_prefix: str = '') -> None:
+        """
+        Clean a list of files into an existing folder, adding each outcome to report.
+        
+        Each output is written to a hidden '.<partial_prefix><name>.partial' file
+        and only gets its final name once it is complete, so a crash never leaves
+        a truncated file behind a valid-looking name.
+        """
         total_files = len(input_files)
-        results = {
-            'processed': [],
-            'failed': [],
-            'skipped': []
-        }
         
         for idx, input_file in enumerate(input_files):
             # Check if file is a supported image
             if not self.is_supported_image(input_file):
-                results['skipped'].append(input_file)
+                message = f"Skipped (unsupported format): {os.path.basename(input_file)}"
+                report.add(FileResult(
+                    input=input_file, output=None, status='skipped', format=None,
+                    bytes_before=0, bytes_after=0, metadata_removed=None,
+                    seconds=0.0, error=None, message=message, verified=None
+                ))
                 if progress_callback:
-                    progress_callback(idx + 1, total_files, 
-                                    f"Skipped (unsupported format): {os.path.basename(input_file)}")
+                    progress_callback(idx + 1, total_files, message)
                 continue
             
-            # Generate output filename
             base_name = Path(input_file).stem
-            output_file = os.path.join(output_folder, f"{base_name}_cleaned.jpg")
-            
-            # Handle duplicate filenames
-            counter = 1
-            while os.path.exists(output_file):
-                output_file = os.path.join(output_folder, 
-                                         f"{base_name}_cleaned_{counter}.jpg")
-                counter += 1
+            partial_file = os.path.join(
+                output_folder, f".{partial_prefix}{base_name}.{os.urandom(4).hex()}.partial"
+            )
             
             # Process the image
-            success, message = self.remove_metadata(input_file, output_file)
-            
-            if success:
-                results['processed'].append(output_file)
-            else:
-                results['failed'].append(input_file)
+            record, verification_seconds = self._clean_file(
+                input_file, partial_file, input_file, None,
+                verify, verify_pixels, max_bytes, min_psnr
+            )
+            if record.status == 'processed':
+                # The extension follows the format the optimizer picked
+                try:
+                    record.output = self._publish_output(
+                        partial_file, output_folder, base_name,
+                        self.OUTPUT_EXTENSIONS[record.format]
+                    )
+                except OSError as e:
+                    record.status, record.error = 'failed', type(e).__name__
+                    record.message = f"Failed to save {os.path.basename(input_file)}: {str(e)}"
+            if record.status == 'failed' and os.path.exists(partial_file):
+                os.remove(partial_file)
+            report.add(record, verification_seconds)
             
             # Update progress
             if progress_callback:
-                progress_callback(idx + 1, total_files, message)
+                progress_callback(idx + 1, total_files, record.message)
+    
+    def shard_of(self, input_file: str, shard_count: int) -> int:
+        """
+        Return the shard an input file belongs to.
+        
+        The hash is stable across processes and hosts (unlike hash()), so every
+        node agrees on the split as long as they list the inputs by the same paths.
+        """
+        import hashlib
+        digest = hashlib.sha1(os.path.normpath(input_file).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % shard_count
+    
+    def _shard_paths(self, output_folder: str, shard_index: int,
+                     shard_count: int) -> Tuple[str, str, str]:
+        """Return the (lease, done marker, report) paths of one shard."""
+        base = os.path.join(output_folder, self.SHARD_FOLDER,
+                            f"shard-{shard_index:05d}-of-{shard_count:05d}")
+        return f"{base}.lease", f"{base}.done", f"{base}.jsonl"
+    
+    def _claim_lease(self, lease_path: str, owner: str, lease_timeout: float) -> bool:
+        """
+        Try to take the lease file of a shard.
+        
+        Leases are created exclusively, so only one node can hold a shard. A
+        lease whose file has not been touched for lease_timeout seconds belongs
+        to a node that died and may be taken over.
+        """
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lease_path) < lease_timeout:
+                    return False
+                # Only one node can win the rename of a stale lease
+                stale_path = f"{lease_path}.{owner}.stale"
+                os.rename(lease_path, stale_path)
+            except FileNotFoundError:
+                return False
+            if time.time() - os.path.getmtime(stale_path) < lease_timeout:
+                # Another node renewed the lease in the meantime; give it back
+                try:
+                    os.link(stale_path, lease_path)
+                except FileExistsError:
+                    pass
+                os.remove(stale_path)
+                return False
+            os.remove(stale_path)
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(owner)
+        return True
+    
+    def _renew_lease(self, lease_path: str, owner: str) -> bool:
+        """
+        Touch a lease file, but only while this node still owns it.
+        
+        The file is touched through the descriptor it was read from, so a
+        takeover that renames the lease in between sees the renewal on the
+        stale file and gives the lease back. Returns False once the lease
+        belongs to another node or is gone.
+        """
+        try:
+            with open(lease_path) as f:
+                if f.read() != owner:
+                    return False
+                if os.utime in os.supports_fd:
+                    os.utime(f.fileno())
+                else:
+                    os.utime(lease_path)
+        except FileNotFoundError:
+            return False
+        return True
+    
+    def _release_lease(self, lease_path: str, owner: str) -> None:
+        """Remove a lease file unless another node has taken it over."""
+        try:
+            with open(lease_path) as f:
+                if f.read() != owner:
+                    return
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+    
+    def _read_report(self, report_path: str) -> Iterator[dict]:
+        """Yield the records of a JSONL report, ignoring a truncated last line."""
+        import json
+        with open(report_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # Partial line left by a node that stopped mid-write
+    
+    def process_shards(self, input_files: List[str], output_folder: str, shard_count: int,
+                       progress_callback=None, verify: bool = False,
+                       verify_pixels: bool = False, lease_timeout: float = 600.0,
+                       max_bytes: Optional[int] = None, min_psnr: Optional[float] = None,
+                       keep_records: bool = False, poll_interval: float = 5.0) -> dict:
+        """
+        Process a job shared by several nodes through lease files.
+        
+        Every node runs this with the same inputs, output folder and shard
+        count. Each one claims a shard that no other node holds, processes it
+        and marks it done, and returns only once every shard is marked done,
+        whichever node did it. Coordination happens through files in the
+        output folder's .shards subfolder, so no central service is needed.
+        
+        While other nodes hold the remaining shards, the node polls every
+        poll_interval seconds. A shard whose node stops renewing its lease for
+        lease_timeout seconds is taken over by a waiting node, skipping inputs
+        that were already cleaned. A node that finds its lease taken over
+        stops that shard without marking it done. Outputs are written to
+        hidden .partial files and only get their final name once complete, and
+        a node that resumes a shard first removes the partial and empty files
+        left by the node before it. Final names are claimed exclusively, so
+        they never collide across nodes. Inputs are tracked by path, so list
+        each input only once.
+        
+        Args:
+            input_files: List of input file paths, identical on every node
+            output_folder: Shared folder where cleaned images will be saved
+            shard_count: Number of shards to split the job into
+            progress_callback: Optional callback function for progress updates
+            verify: Re-scan each output's header to confirm no metadata remains
+            verify_pixels: With verify, also compare pixel hashes for lossless outputs
+            lease_timeout: Seconds after which an unrenewed lease is considered
+                abandoned; keep it well above the clock skew between nodes
+            max_bytes: Optimize each output to fit this many bytes
+            min_psnr: Optimize each output down to this quality (PSNR in dB)
+            keep_records: Also keep every FileResult in memory; records are
+                always written to the per-shard reports
+            poll_interval: Seconds to wait between checks for shards that
+                other nodes still hold
+            
+        Returns:
+            Dictionary with the results of the files this node processed;
+            'shards' lists the shards it finished and 'lost_shards' those
+            another node took over from it
+        """
+        import socket
         
+        os.makedirs(os.path.join(output_folder, self.SHARD_FOLDER), exist_ok=True)
+        owner = f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        
+        shards = [[] for _ in range(shard_count)]
+        for input_file in input_files:
+            shards[self.shard_of(input_file, shard_count)].append(input_file)
+        
+        report = BatchReport(keep_records=keep_records)
+        claimed = []
+        lost = []
+        pending = list(range(shard_count))
+        try:
+            while pending:
+                progressed = False
+                for shard_index in list(pending):
+                    lease_path, done_path, report_path = self._shard_paths(
+                        output_folder, shard_index, shard_count
+                    )
+                    if os.path.exists(done_path):
+                        pending.remove(shard_index)
+                        continue
+                    if not self._claim_lease(lease_path, owner, lease_timeout):
+                        continue
+                    progressed = True
+                    
+                    try:
+                        shard_files = shards[shard_index]
+                        # Resume a shard taken over from a node that stopped
+                        if os.path.exists(report_path):
+                            cleaned = {record['input']
+                                       for record in self._read_report(report_path)
+                                       if record['status'] == 'processed'}
+                            shard_files = [f for f in shard_files if f not in cleaned]
+                        # Clear what a node that stopped mid-file left behind
+                        partial_prefix = f"{os.path.splitext(os.path.basename(lease_path))[0]}-"
+                        self._clear_leftovers(output_folder, partial_prefix, shard_files,
+                                              lease_timeout / 2)
+                        
+                        last_renewal = time.monotonic()
+                        
+                        def renew_lease(current, total, message):
+                            nonlocal last_renewal
+                            if time.monotonic() - last_renewal >= lease_timeout / 4:
+                                if not self._renew_lease(lease_path, owner):
+                                    raise _LeaseLost(shard_index)
+                                last_renewal = time.monotonic()
+                            if progress_callback:
+                                progress_callback(current, total, message)
+                        
+                        report.stream_to(report_path, append=True)
+                        self._process_files(shard_files, output_folder, report, renew_lease,
+                                            verify, verify_pixels, max_bytes, min_psnr,
+                                            partial_prefix)
+                        report.close()
+                        if not self._renew_lease(lease_path, owner):
+                            raise _LeaseLost(shard_index)
+                        
+                        with open(done_path, 'w') as f:
+                            f.write(owner)
+                        claimed.append(shard_index)
+                        pending.remove(shard_index)
+                    except _LeaseLost:
+                        # The new owner finishes the shard and marks it done
+                        report.close()
+                        lost.append(shard_index)
+                    finally:
+                        # Release the lease so a failed shard can be retried at once
+                        self._release_lease(lease_path, owner)
+                
+                if pending and not progressed:
+                    time.sleep(poll_interval)
+        finally:
+            report.close()
+        
+        self._report = report
+        results = report.to_results()
+        results['shards'] = claimed
+        results['lost_shards'] = lost
         return results
     
-    def get_summary(self) -> str:
-        """Get a summary of the processing results."""
+    def merge_shard_reports(self, output_folder: str, shard_count: int,
+                            merged_path: str) -> dict:
+        """
+        Combine the per-shard reports of a process_shards job into one report.
+        
+        When a shard was taken over, only the latest record of each input is kept.
+        Records are matched by input path, so an input listed more than once
+        in the job counts once here (and is also cleaned only once when a shard
+        is resumed); list every input once.
+        
+        Args:
+            output_folder: Output folder of the sharded job
+            shard_count: Number of shards the job was split into
+            merged_path: .jsonl or .csv file to write the merged records to
+            
+        Returns:
+            Dictionary with record counts per status, the total 'bytes_saved' and
+            'missing_shards', the shards that are not marked done yet
+        """
+        summary = {
+            'processed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'verification_failed': 0,
+            'bytes_saved': 0,
+            'missing_shards': []
+        }
+        
+        writer = ResultWriter(merged_path)
+        try:
+            for shard_index in range(shard_count):
+                _, done_path, report_path = self._shard_paths(
+                    output_folder, shard_index, shard_count
+                )
+                if not os.path.exists(done_path):
+                    summary['missing_shards'].append(shard_index)
+                if not os.path.exists(report_path):
+                    continue
+                
+                latest = {}
+                for record in self._read_report(report_path):
+                    latest[record['input']] = record
+                for record in latest.values():
+                    # Reports written by older versions may lack newer fields
+                    result = FileResult(**{name: record.get(name)
+                                           for name in FileResult.__slots__})
+                    writer.write(result)
+                    summary[result.status] += 1
+                    if result.status == 'processed' and None not in (result.bytes_before,
+                                                                     result.bytes_after):
+                        summary['bytes_saved'] += result.bytes_saved
+                    if result.verified is False:
+                        summary['verification_failed'] += 1
+        finally:
+            writer.close()
+        
+        return summary
+    
+    def _archive_kind(self, archive_path: str) -> str:
+        """Return 'zip' or 'tar' for an input archive, judged by its contents."""
+        import tarfile
+        import zipfile
+        if zipfile.is_zipfile(archive_path):
+            return 'zip'
+        if tarfile.is_tarfile(archive_path):
+            return 'tar'
+        raise ValueError(f"Unsupported archive format: {os.path.basename(archive_path)}")
+    
+    def _iter_archive_members(self, archive_path: str) -> Iterator[
+            Tuple[str, Optional[bytes], Optional[Exception]]]:
+        """
+        Yield (name, data, error) for every regular file in a ZIP or TAR archive.
+        
+        Unsupported members are yielded with data set to None so callers can
+        report them without paying for the read. Members that can't be read
+        (bad CRC, encrypted, truncated) are yielded with the read error instead.
+        """
+        import tarfile
+        import zipfile
+        if self._archive_kind(archive_path) == 'zip':
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    if not self.is_supported_image(info.filename):
+                        yield info.filename, None, None
+                        continue
+                    try:
+                        data = archive.read(info)
+                    except Exception as e:
+                        yield info.filename, None, e
+                        continue
+                    yield info.filename, data, None
+        else:
+            # Stream mode reads members sequentially without seeking
+            with tarfile.open(archive_path, mode='r|*') as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    if not self.is_supported_image(member.name):
+                        yield member.name, None, None
+                        continue
+                    try:
+                        data = archive.extractfile(member).read()
+                    except Exception as e:
+                        # A stream can't be read past a damaged member
+                        yield member.name, None, e
+                        return
+                    yield member.name, data, None
+    
+    def _safe_member_path(self, member_name: str) -> str:
+        """
+        Turn an archive member name into a relative path that stays inside the archive.
+        
+        Absolute paths, drive letters, '.' and '..' components are dropped so a
+        crafted input can't make the output archive extract outside its folder.
+        """
+        parts = [part for part in member_name.replace('\\', '/').split('/')
+                 if part not in ('', '.', '..')]
+        if parts and parts[0].endswith(':'):  # Windows drive letter
+            parts = parts[1:]
+        return '/'.join(parts)
+    
+    def _open_output_archive(self, archive_path: str, write_path: str):
+        """
+        Open an output archive for writing and return (archive, kind).
+        
+        The format is chosen from archive_path's extension; the data is
+        written to write_path.
+        """
+        import tarfile
+        import zipfile
+        lower = archive_path.lower()
+        if lower.endswith('.zip'):
+            return zipfile.ZipFile(write_path, mode='w'), 'zip'
+        for suffix, mode in self.TAR_WRITE_MODES.items():
+            if lower.endswith(suffix):
+                return tarfile.open(write_path, mode=mode), 'tar'
+        raise ValueError(f"Unsupported output archive format: {os.path.basename(archive_path)}")
+    
+    def process_archive(self, input_archive: str, output_archive: str,
+                        progress_callback=None, max_workers: Optional[int] = None,
+                        verify: bool = False, verify_pixels: bool = False,
+                        report_path: Optional[str] = None, max_bytes: Optional[int] = None,
+                        min_psnr: Optional[float] = None,
+                        keep_records: Optional[bool] = None) -> dict:
+        """
+        Remove metadata from every image inside a ZIP or TAR archive.
+        
+        Members are read straight from the input archive, cleaned in parallel
+        and written to the output archive without touching a temporary folder.
+        Cleaned JPEGs are stored uncompressed in ZIP output since recompressing
+        them only costs CPU. The output is written to a .partial file that
+        replaces output_archive only once the whole archive succeeded, so a
+        failed run never leaves a half-written archive behind. Members that
+        can't be read are reported as failed like any other broken image.
+        
+        Args:
+            input_archive: Path to the input .zip or .tar(.gz/.bz2/.xz) archive
+            output_archive: Path of the archive to create; the format is chosen
+                from its extension (.zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz)
+            progress_callback: Optional callback function for progress updates;
+                total is passed as None because streamed archives have no known length
+            max_workers: Number of worker threads (defaults to the CPU count)
+            verify: Re-scan each cleaned member's header to confirm no metadata remains
+            verify_pixels: With verify, also compare pixel hashes for lossless outputs
+            report_path: Optional .jsonl or .csv file that each result record is streamed to
+            max_bytes: Optimize each member to fit this many bytes
+            min_psnr: Optimize each member down to this quality (PSNR in dB)
+            keep_records: Keep every FileResult in memory; defaults to True
+                unless report_path is set (see BatchReport)
+            
+        Returns:
+            Dictionary with processing results, keyed by archive member name
+        """
+        import tarfile
+        import zipfile
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        # Bound the number of decoded members held in memory at once
+        window = max_workers * 2
+        
+        # Check the input before anything is written, so it can't be overwritten
+        self._archive_kind(input_archive)
+        if os.path.realpath(output_archive) == os.path.realpath(input_archive) or (
+                os.path.exists(output_archive) and os.path.samefile(output_archive, input_archive)):
+            raise ValueError("The output archive must differ from the input archive")
+        
+        output_dir = os.path.dirname(output_archive)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        partial_path = f"{output_archive}.partial"
+        archive, kind = self._open_output_archive(output_archive, partial_path)
+        report = BatchReport(report_path, keep_records)
+        used_names = set()
+        
+        def output_name(member_name: str, extension: str) -> str:
+            directory, filename = posixpath.split(self._safe_member_path(member_name))
+            base_name = posixpath.splitext(filename)[0]
+            candidate = posixpath.join(directory, f"{base_name}_cleaned{extension}")
+            counter = 1
+            while candidate in used_names:
+                candidate = posixpath.join(directory, f"{base_name}_cleaned_{counter}{extension}")
+                counter += 1
+            used_names.add(candidate)
+            return candidate
+        
+        def write_member(name: str, data: bytes) -> None:
+            if kind == 'zip':
+                info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_STORED
+                archive.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        
+        def clean_member(member_name: str, data: bytes) -> Tuple[FileResult, bytes, float]:
+            output = io.BytesIO()
+            record, verification_seconds = self._clean_file(
+                io.BytesIO(data), output, member_name, None,
+                verify, verify_pixels, max_bytes, min_psnr
+            )
+            return record, output.getvalue(), verification_seconds
+        
+        completed = 0
+        
+        def finish(future) -> None:
+            nonlocal completed
+            completed += 1
+            record, data, verification_seconds = future.result()
+            if record.status == 'processed':
+                record.output = output_name(record.input, self.OUTPUT_EXTENSIONS[record.format])
+                write_member(record.output, data)
+            report.add(record, verification_seconds)
+            if progress_callback:
+                progress_callback(completed, None, record.message)
+        
+        try:
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    pending = deque()
+                    for member_name, data, error in self._iter_archive_members(input_archive):
+                        if data is None:
+                            completed += 1
+                            if error is not None:
+                                message = (f"Failed to process {os.path.basename(member_name)}: "
+                                           f"{str(error)}")
+                                record = FileResult(
+                                    input=member_name, output=None, status='failed',
+                                    format=None, bytes_before=0, bytes_after=0,
+                                    metadata_removed=None, seconds=0.0,
+                                    error=type(error).__name__, message=message, verified=None
+                                )
+                            else:
+                                message = f"Skipped (unsupported format): {member_name}"
+                                record = FileResult(
+                                    input=member_name, output=None, status='skipped',
+                                    format=None, bytes_before=0, bytes_after=0,
+                                    metadata_removed=None, seconds=0.0, error=None,
+                                    message=message, verified=None
+                                )
+                            report.add(record)
+                            if progress_callback:
+                                progress_callback(completed, None, message)
+                            continue
+                        
+                        pending.append(executor.submit(clean_member, member_name, data))
+                        # Write finished members in input order to keep output deterministic
+                        while len(pending) >= window:
+                            finish(pending.popleft())
+                    
+                    for future in pending:
+                        finish(future)
+            finally:
+                archive.close()
+            os.replace(partial_path, output_archive)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            report.close()
+        
+        self._report = report
+        return report.to_results()
+    
+    def get_summary(self, report: Optional[BatchReport] = None) -> str:
+        """
+        Get a summary of the processing results.
+        
+        Args:
+            report: Batch to summarize (results['report']); defaults to the most recent batch
+        """
+        if report is None:
+            report = self._report
+        
         summary = f"Processing Complete!\n\n"
-        summary += f"✓ Successfully processed: {self.processed_count}\n"
-        summary += f"✗ Failed: {self.failed_count}\n"
+        summary += f"✓ Successfully processed: {report.processed_count}\n"
+        summary += f"✗ Failed: {report.failed_count}\n"
+        if report.verification_failed_count:
+            summary += f"⚠ Failed verification: {report.verification_failed_count}\n"
         
-        if self.errors:
+        if report.errors:
             summary += f"\nErrors:\n"
-            for error in self.errors[:5]:  # Show first 5 errors
+            for error in report.errors[:5]:  # Show first 5 errors
                 summary += f"  • {error}\n"
-            if len(self.errors) > 5:
-                summary += f"  ... and {len(self.errors) - 5} more errors\n"
+            if len(report.errors) > 5:
+                summary += f"  ... and {len(report.errors) - 5} more errors\n"
         
         return summary
@@ -3,7 +3,22 @@ Test script to verify the metadata remover functionality
 """
 
 from metadata_remover import MetadataRemover
+from PIL import Image
+import io
 import os
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+
+
+def make_image_bytes(image_format='PNG', size=(40, 30), **options):
+    """Encode a small test image in memory."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 40, 90)).save(buffer, format=image_format, **options)
+    return buffer.getvalue()
 
 
 def test_metadata_remover():
@@ -31,12 +46,324 @@ def test_metadata_remover():
         is_supported = remover.is_supported_image(file)
         status = "✓" if is_supported else "✗"
         print(f"   {status} {file}: {'Supported' if is_supported else 'Not supported'}")
+
+
+def test_mislabelled_files():
+    """Test format sniffing and that files with a misleading extension still get cleaned."""
+    remover = MetadataRemover()
     
-    print("\n" + "=" * 50)
-    print("✅ All tests passed!")
-    print("\nℹ️  To use the application, run: python gui.py")
-    print("   Or on Windows, double-click: run.bat")
+    print("\n✅ Testing format sniffing:")
+    assert remover._sniff_format('photo.JPG') == 'JPEG'
+    assert remover._sniff_format('photo.gif') is None
+    for image_format in ('JPEG', 'PNG', 'TIFF', 'BMP', 'WEBP'):
+        assert remover._sniff_format(io.BytesIO(make_image_bytes(image_format))) == image_format
+    print("   ✓ Formats sniffed from extensions and leading bytes")
+    
+    with tempfile.TemporaryDirectory() as folder:
+        for name, image_format in (('png.jpg', 'PNG'), ('gif.jpg', 'GIF')):
+            input_file = os.path.join(folder, name)
+            with open(input_file, 'wb') as f:
+                f.write(make_image_bytes(image_format))
+            success, message = remover.remove_metadata(input_file,
+                                                       os.path.join(folder, f'out_{name}'))
+            assert success, message
+        
+        with Image.open(os.path.join(folder, 'out_gif.jpg')) as img:
+            assert img.format == 'JPEG'
+        print("   ✓ PNG and GIF data named .jpg cleaned")
+
+
+def test_archive_processing():
+    """Test cleaning images inside an archive, including hostile member names."""
+    remover = MetadataRemover()
+    
+    print("\n✅ Testing archive processing:")
+    with tempfile.TemporaryDirectory() as folder:
+        input_archive = os.path.join(folder, 'in.zip')
+        with zipfile.ZipFile(input_archive, 'w') as archive:
+            archive.writestr('photos/good.png', make_image_bytes())
+            archive.writestr('../../escape.png', make_image_bytes())
+            archive.writestr('/abs/rooted.png', make_image_bytes())
+            archive.writestr('photos/broken.jpg', b'not an image')
+        
+        results = remover.process_archive(input_archive, os.path.join(folder, 'out.zip'))
+        
+        assert sorted(results['processed']) == [
+            'abs/rooted_cleaned.jpg', 'escape_cleaned.jpg', 'photos/good_cleaned.jpg'
+        ], results['processed']
+        assert results['failed'] == ['photos/broken.jpg']
+        
+        message = results['records'][-1].message
+        assert 'photos/broken.jpg' in message and 'BytesIO' not in message, message
+        print(f"   ✓ Member names kept inside the archive; failure reads: {message}")
+        
+        # A member with a bad CRC fails on its own instead of ending the archive
+        damaged_archive = os.path.join(folder, 'damaged.zip')
+        with zipfile.ZipFile(damaged_archive, 'w') as archive:
+            archive.writestr('a.png', make_image_bytes())
+            archive.writestr('b.png', make_image_bytes())
+        with open(damaged_archive, 'r+b') as f:
+            data = f.read()
+            f.seek(data.index(b'IHDR'))  # Inside a.png's stored data
+            f.write(b'IHDX')
+        results = remover.process_archive(damaged_archive, os.path.join(folder, 'fixed.zip'))
+        assert results['failed'] == ['a.png'] and results['processed'] == ['b_cleaned.jpg']
+        assert results['records'][0].error == 'BadZipFile', results['records'][0]
+        print(f"   ✓ Damaged member reported: {results['records'][0].message}")
+        
+        # Bad inputs must leave the input intact and no output behind
+        size = os.path.getsize(input_archive)
+        try:
+            remover.process_archive(input_archive, input_archive)
+            raise AssertionError("writing over the input archive was allowed")
+        except ValueError:
+            pass
+        assert os.path.getsize(input_archive) == size
+        
+        not_archive = os.path.join(folder, 'notarch.zip')
+        with open(not_archive, 'wb') as f:
+            f.write(b'hello')
+        try:
+            remover.process_archive(not_archive, os.path.join(folder, 'out1.zip'))
+            raise AssertionError("a non-archive input was accepted")
+        except ValueError:
+            pass
+        assert not any(name.startswith('out1.zip') for name in os.listdir(folder))
+        print("   ✓ Output over the input and non-archive inputs rejected without writing")
+
+
+def test_streamed_reports():
+    """Test that streaming records to a report doesn't also keep them in memory."""
+    remover = MetadataRemover()
+    
+    print("\n✅ Testing streamed reports:")
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, 'photo.png')
+        with open(input_file, 'wb') as f:
+            f.write(make_image_bytes())
+        report_path = os.path.join(folder, 'report.jsonl')
+        
+        results = remover.process_images([input_file] * 3, os.path.join(folder, 'out'),
+                                         report_path=report_path)
+        
+        assert results['records'] == [] and results['processed_count'] == 3
+        with open(report_path) as f:
+            assert len(f.readlines()) == 3
+        print("   ✓ 3 records streamed, none held in memory")
+        
+        # Standalone calls must not change a batch's results after they are returned
+        results = remover.process_images([input_file], os.path.join(folder, 'batch'))
+        for idx in range(3):
+            remover.remove_metadata(input_file, os.path.join(folder, f'single_{idx}.jpg'))
+        assert len(results['records']) == 1
+        assert results['report'].processed_count == 1
+        assert remover.processed_count == 3
+        print("   ✓ remove_metadata leaves earlier batch results untouched")
+
+
+def jpeg_segment(code, payload):
+    """Encode one JPEG marker segment."""
+    return b'\xff' + bytes([code]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def test_verification():
+    """Test that verification finds leftover metadata and survives outputs it can't check."""
+    remover = MetadataRemover()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'
+    
+    print("\n✅ Testing verification:")
+    data = make_image_bytes('JPEG', exif=exif.tobytes(), comment=b'secret')
+    data = (data[:2] + jpeg_segment(0xE1, b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>')
+            + jpeg_segment(0xED, b'Photoshop 3.0\x008BIM') + data[2:])
+    image_format, found = remover.find_metadata(io.BytesIO(data))
+    assert image_format == 'JPEG' and sorted(found) == ['COM', 'EXIF', 'IPTC', 'XMP'], found
+    print(f"   ✓ JPEG metadata found: {', '.join(found)}")
+    
+    webp = make_image_bytes('WEBP', exif=exif.tobytes(), xmp=b'<x:xmpmeta/>')
+    assert remover.find_metadata(io.BytesIO(webp)) == ('WEBP', ['EXIF', 'XMP'])
+    assert remover.find_metadata(io.BytesIO(make_image_bytes('WEBP'))) == ('WEBP', [])
+    print("   ✓ WebP metadata found: EXIF, XMP")
+    
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, 'photo.jpg')
+        with open(input_file, 'wb') as f:
+            f.write(data)
+        
+        # A cleaner that leaves the file untouched must be caught
+        remover._clean_image = lambda source, destination, name=None: shutil.copyfile(
+            source, destination)
+        results = remover.process_images([input_file], os.path.join(folder, 'copied'),
+                                         verify=True)
+        assert results['verification_failed'] == results['processed'], results
+        assert results['report'].verification_failed_count == 1
+        print(f"   ✓ Leftover metadata reported: {results['records'][0].message}")
+        del remover._clean_image
+        
+        # An error while checking fails the check instead of ending the batch
+        def broken_check(*args):
+            raise OSError("disk went away")
+        remover._verify_output = broken_check
+        results = remover.process_images([input_file] * 2, os.path.join(folder, 'unchecked'),
+                                         verify=True)
+        assert results['processed_count'] == 2 and len(results['verification_failed']) == 2
+        assert 'disk went away' in results['records'][0].message, results['records'][0]
+        print(f"   ✓ Verification error recorded: {results['records'][0].message}")
+
+
+def test_shard_takeover():
+    """Test that a node stops a shard whose lease was taken over, then finishes it once stale."""
+    remover = MetadataRemover()
+    
+    print("\n✅ Testing shard lease takeover:")
+    with tempfile.TemporaryDirectory() as folder:
+        input_files = []
+        for idx in range(3):
+            input_files.append(os.path.join(folder, f'photo_{idx}.png'))
+            with open(input_files[-1], 'wb') as f:
+                f.write(make_image_bytes())
+        output_folder = os.path.join(folder, 'out')
+        lease_path = os.path.join(output_folder, '.shards', 'shard-00000-of-00001.lease')
+        
+        def take_over_once(current, total, message):
+            # Another node grabs the lease after the first file, before our next renewal
+            if not take_over_once.done:
+                take_over_once.done = True
+                with open(lease_path, 'w') as f:
+                    f.write('other-node')
+                time.sleep(0.3)
+        take_over_once.done = False
+        
+        results = remover.process_shards(input_files, output_folder, 1,
+                                         progress_callback=take_over_once,
+                                         lease_timeout=1.0, poll_interval=0.1)
+        
+        assert results['lost_shards'] == [0] and results['shards'] == [0], results
+        summary = remover.merge_shard_reports(output_folder, 1,
+                                              os.path.join(folder, 'merged.jsonl'))
+        assert summary['processed'] == 3 and summary['missing_shards'] == [], summary
+        assert len([name for name in os.listdir(output_folder) if name.endswith('.jpg')]) == 3
+        print("   ✓ Lost lease detected, shard taken back once stale and resumed")
+        
+        # A node that died mid-file leaves a partial output and an empty reserved name
+        crashed_folder = os.path.join(folder, 'crashed')
+        os.makedirs(crashed_folder)
+        leftovers = [os.path.join(crashed_folder, '.shard-00000-of-00001-photo_0.1a2b3c4d.partial'),
+                     os.path.join(crashed_folder, 'photo_1_cleaned.jpg')]
+        with open(leftovers[0], 'wb') as f:
+            f.write(b'\xff\xd8 truncated')
+        open(leftovers[1], 'wb').close()
+        for path in leftovers:
+            os.utime(path, (time.time() - 60, time.time() - 60))
+        
+        remover.process_shards(input_files, crashed_folder, 1, lease_timeout=10.0)
+        names = sorted(name for name in os.listdir(crashed_folder) if name != '.shards')
+        assert names == ['photo_0_cleaned.jpg', 'photo_1_cleaned.jpg', 'photo_2_cleaned.jpg'], names
+        assert all(os.path.getsize(os.path.join(crashed_folder, name)) > 0 for name in names)
+        print("   ✓ Leftover partial and empty outputs cleared on resume")
+        
+        # Reports from older versions only carry some of the fields
+        old_folder = os.path.join(folder, 'old')
+        os.makedirs(os.path.join(old_folder, '.shards'))
+        with open(os.path.join(old_folder, '.shards', 'shard-00000-of-00001.jsonl'), 'w') as f:
+            f.write('{"input": "a.jpg", "output": "a_cleaned.jpg", "status": "processed"}\n')
+        summary = remover.merge_shard_reports(old_folder, 1, os.path.join(folder, 'old.csv'))
+        assert summary['processed'] == 1 and summary['bytes_saved'] == 0, summary
+        print("   ✓ Older shard reports merged")
+
+
+def make_noisy_image(size=(64, 48)):
+    """Build an image with enough detail that encoders emit 0xFF bytes in their data."""
+    return Image.frombytes('RGB', size, bytes((idx * 37 + idx // 7) % 256
+                                              for idx in range(size[0] * size[1] * 3)))
+
+
+def png_chunk(chunk_type, data):
+    """Encode one PNG chunk with its CRC."""
+    return (struct.pack('>I', len(data)) + chunk_type + data
+            + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def test_lossless_strips():
+    """Test that lossless strips keep the pixels and drop every metadata segment."""
+    remover = MetadataRemover()
+    img = make_noisy_image()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'
+    
+    print("\n✅ Testing lossless strips:")
+    jpeg_variants = {
+        'baseline': {},
+        'progressive': {'progressive': True},
+        'restart markers': {'restart_marker_blocks': 1},
+    }
+    for label, options in jpeg_variants.items():
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', exif=exif.tobytes(), comment=b'secret', **options)
+        data = buffer.getvalue() + b'trailing data'
+        stripped = remover._strip_jpeg(data)
+        
+        assert stripped.endswith(b'\xff\xd9'), label
+        assert remover.find_metadata(io.BytesIO(stripped)) == ('JPEG', []), label
+        with Image.open(io.BytesIO(data)) as before, Image.open(io.BytesIO(stripped)) as after:
+            assert before.tobytes() == after.tobytes(), label
+        print(f"   ✓ JPEG ({label}): metadata and trailing data removed, pixels unchanged")
+    
+    # Metadata chunks may also follow the image data
+    data = make_image_bytes('PNG')
+    iend = data.rindex(b'IEND') - 4
+    data = data[:iend] + png_chunk(b'tEXt', b'Author\x00Someone') + data[iend:]
+    assert remover.find_metadata(io.BytesIO(data)) == ('PNG', ['tEXt'])
+    stripped = remover._strip_png(data)
+    assert remover.find_metadata(io.BytesIO(stripped)) == ('PNG', [])
+    with Image.open(io.BytesIO(data)) as before, Image.open(io.BytesIO(stripped)) as after:
+        assert before.tobytes() == after.tobytes()
+    print("   ✓ PNG: tEXt chunk after IDAT removed, pixels unchanged")
+    
+    # A JPEG strip is a lossy format but must still pass the pixel check
+    checked = []
+    pixel_digest = remover._pixel_digest
+    remover._pixel_digest = lambda image: checked.append(image.mode) or pixel_digest(image)
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, 'photo.jpg')
+        img.save(input_file, format='JPEG', exif=exif.tobytes())
+        results = remover.process_images([input_file], os.path.join(folder, 'out'),
+                                         verify=True, verify_pixels=True, min_psnr=80.0)
+    record = results['records'][0]
+    assert record.format == 'JPEG' and record.verified and checked, record
+    print("   ✓ JPEG strip output verified against the input pixels")
+
+
+def test_quality_search():
+    """Test that the quality search honours the size and quality targets."""
+    remover = MetadataRemover()
+    img = Image.radial_gradient('L').convert('RGB').resize((128, 96))
+    
+    print("\n✅ Testing quality search:")
+    smallest = len(remover._encode(img, 'JPEG', MetadataRemover.MIN_SEARCH_QUALITY))
+    best, _ = remover._search_quality(img, 'JPEG', smallest * 2, None)
+    assert best is not None and len(best) <= smallest * 2
+    best, tried = remover._search_quality(img, 'JPEG', smallest - 1, None)
+    assert best is None and len(tried) == smallest
+    print(f"   ✓ Fits {smallest * 2} bytes; reports no result below {smallest} bytes")
+    
+    best, _ = remover._search_quality(img, 'JPEG', None, 45.0)
+    assert best is not None and remover._psnr(img, best) >= 45.0
+    assert len(best) < len(remover._encode(img, 'JPEG', MetadataRemover.MAX_SEARCH_QUALITY))
+    print(f"   ✓ Lowest quality meeting 45 dB: {remover._psnr(img, best):.1f} dB")
 
 
 if __name__ == "__main__":
     test_metadata_remover()
+    test_mislabelled_files()
+    test_archive_processing()
+    test_streamed_reports()
+    test_verification()
+    test_shard_takeover()
+    test_lossless_strips()
+    test_quality_search()
+    
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("\nℹ️  To use the application, run: python gui.py")
+    print("   Or on Windows, double-click: run.bat")